@@ -0,0 +1,106 @@
+"""Persistent cache of compiled Java classes.
+
+Compiling the same sources with the same classpath always yields the same
+class files, so successful compilations are stored on disk keyed by a hash of
+their inputs. This lets subsequent runs on unchanged repos skip ``javac``
+entirely.
+
+.. module:: _compile_cache
+    :synopsis: Persistent cache of compiled Java classes.
+"""
+
+import os
+import time
+import shutil
+import hashlib
+import pathlib
+import tempfile
+import functools
+from typing import Callable, Iterable, Optional, Tuple, Union
+
+import appdirs
+
+from repobee_plug import Status
+
+CACHE_DIR = (
+    pathlib.Path(appdirs.user_cache_dir(appname="repobee-junit4")) / "compile"
+)
+_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+
+def cached_compile(
+    java_files: Iterable[Union[str, pathlib.Path]],
+    classpath: str,
+    compile_to: Callable[[pathlib.Path], Tuple[str, str]],
+) -> Tuple[str, str, Optional[pathlib.Path]]:
+    """Return the directory with the compiled classes for the given Java
+    files, compiling them only if they are not already in the cache.
+
+    Args:
+        java_files: Paths to the ``.java`` files to compile.
+        classpath: The classpath to compile with.
+        compile_to: A function that compiles the files into the provided
+            output directory, returning ``(status, msg)``.
+    Returns:
+        ``(status, msg, classes_dir)``, where ``classes_dir`` is None if
+        compilation failed.
+    """
+    _sweep_once()
+    classes_dir = CACHE_DIR / _cache_key(java_files, classpath)
+    if classes_dir.is_dir():
+        os.utime(classes_dir)
+        return Status.SUCCESS, "all files compiled successfully", classes_dir
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    staging_dir = pathlib.Path(tempfile.mkdtemp(dir=CACHE_DIR, prefix="."))
+    status, msg = compile_to(staging_dir)
+    if status != Status.SUCCESS:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        return status, msg, None
+
+    try:
+        os.replace(staging_dir, classes_dir)
+    except OSError:
+        # a concurrent compilation of the same files got there first
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    return status, msg, classes_dir
+
+
+def _cache_key(
+    java_files: Iterable[Union[str, pathlib.Path]], classpath: str
+) -> str:
+    """Hash everything that affects the output of the compilation: the names
+    and contents of the source files, the classpath and the state of its
+    entries, and the compiler itself. Relative classpath entries (such as
+    ``.``) are resolved against the working directory, whose modification
+    time changes with unrelated files, so only their names are hashed.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    for path in sorted(map(pathlib.Path, java_files)):
+        digest.update(path.name.encode("utf8"))
+        digest.update(hashlib.blake2b(path.read_bytes()).digest())
+
+    entries = [*classpath.split(os.pathsep), shutil.which("javac") or ""]
+    for entry in entries:
+        digest.update(entry.encode("utf8"))
+        if not os.path.isabs(entry):
+            continue
+        try:
+            digest.update(str(os.stat(entry).st_mtime_ns).encode("utf8"))
+        except OSError:
+            pass
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _sweep_once() -> None:
+    """Remove cache entries that have not been used in a while. Only does
+    anything the first time it is called in a process.
+    """
+    if not CACHE_DIR.is_dir():
+        return
+
+    expiry = time.time() - _CACHE_TTL_SECONDS
+    for entry in CACHE_DIR.iterdir():
+        if entry.stat().st_mtime < expiry:
+            shutil.rmtree(entry, ignore_errors=True)
@@ -2,12 +2,20 @@
 in template repositories.
 """
 
+import os
+import sys
+import time
 import shutil
+import hashlib
 import pathlib
 import tempfile
-from typing import List, Iterable, Mapping
+import threading
+import subprocess
+import urllib.parse
+import concurrent.futures
+from typing import List, Iterable, Mapping, Optional
 
-import git
+import appdirs
 
 import repobee_plug as plug
 
@@ -31,6 +39,21 @@ behavior may change in coming updates.
 ).strip()
 
 
+# cloning is network bound, so there is little point in using more threads
+# than this even for a large amount of assignments
+_MAX_CLONE_WORKERS = 8
+
+# bare, shallow clones of template repos are cached here such that subsequent
+# runs only need to fetch the branch instead of cloning from scratch
+_CLONE_CACHE_DIR = (
+    pathlib.Path(appdirs.user_cache_dir(appname="repobee-junit4"))
+    / "rtd-clones"
+)
+_CLONE_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+_SKIPPED_DIRNAMES = frozenset({"target", "build"})
+
+
 class GenerateRTD(plug.Plugin, plug.cli.Command):
     __settings__ = plug.cli.command_settings(
         action=JUNIT4_COMMAND_CATEGORY.generate_rtd,
@@ -66,13 +89,8 @@ class GenerateRTD(plug.Plugin, plug.cli.Command):
                 status=plug.Status.ERROR,
             )
 
-        assignment_names_progress = plug.cli.io.progress_bar(
-            self.args.assignments,
-            desc="Processing template repos",
-            unit="repo",
-        )
         return _generate_test_dirs(
-            assignment_names_progress,
+            self.args.assignments,
             branch=self.branch,
             template_org_name=self.args.template_org_name,
             reference_tests_dir=self.junit4_reference_tests_dir,
@@ -90,28 +108,63 @@ def _generate_test_dirs(
     """Generate test directories for the provided assignments, assuming that
     they are not already present in the reference tests directory.
     """
-    with tempfile.TemporaryDirectory() as tmpdir:
+    _sweep_clone_cache()
+
+    # the workdir is placed inside of the RTD such that the test directories
+    # can be moved into place by renaming them rather than copying
+    reference_tests_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(
+        dir=reference_tests_dir, prefix=".generate-rtd-"
+    ) as tmpdir:
         workdir = pathlib.Path(tmpdir)
         assignment_test_classes = {}
-        for assignment_name in assignment_names:
-            try:
-                extracted_test_classes = _generate_assignment_tests_dir(
-                    assignment_name, branch, template_org_name, workdir, api
-                )
-            except _CloneError as exc:
-                return plug.Result(
-                    name=str(JUNIT4_COMMAND_CATEGORY.generate_rtd),
-                    msg=f"Failed to clone template for "
-                    f"'{exc.dir_name}' on branch '{exc.branch}'. "
-                    "Ensure that the repo and branch exist.",
-                    status=plug.Status.ERROR,
+        lock = threading.Lock()
+
+        def generate(assignment_name: str) -> None:
+            extracted_test_classes = _generate_assignment_tests_dir(
+                assignment_name, branch, template_org_name, workdir, api
+            )
+            with lock:
+                assignment_test_classes[assignment_name] = (
+                    extracted_test_classes
                 )
-            assignment_test_classes[assignment_name] = extracted_test_classes
 
-        for test_dir in workdir.iterdir():
-            shutil.copytree(
-                src=test_dir, dst=reference_tests_dir / test_dir.name
+        max_workers = min(_MAX_CLONE_WORKERS, len(assignment_names)) or 1
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers
+        )
+        try:
+            futures = [
+                executor.submit(generate, assignment_name)
+                for assignment_name in assignment_names
+            ]
+            for future in plug.cli.io.progress_bar(
+                concurrent.futures.as_completed(futures),
+                desc="Processing template repos",
+                unit="repo",
+                total=len(futures),
+            ):
+                future.result()
+        except _CloneError as exc:
+            executor.shutdown(wait=True, cancel_futures=True)
+            return plug.Result(
+                name=str(JUNIT4_COMMAND_CATEGORY.generate_rtd),
+                msg=f"Failed to clone template for "
+                f"'{exc.dir_name}' on branch '{exc.branch}'. "
+                "Ensure that the repo and branch exist.",
+                status=plug.Status.ERROR,
             )
+        finally:
+            executor.shutdown(wait=True)
+
+        # preserve the order in which the assignments were specified
+        assignment_test_classes = {
+            assignment_name: assignment_test_classes[assignment_name]
+            for assignment_name in assignment_names
+        }
+
+        for test_dir in workdir.iterdir():
+            os.replace(src=test_dir, dst=reference_tests_dir / test_dir.name)
 
     return plug.Result(
         name=str(JUNIT4_COMMAND_CATEGORY.generate_rtd),
@@ -135,39 +188,181 @@ def _generate_assignment_tests_dir(
     assignment_test_dir.mkdir(parents=True, exist_ok=False)
 
     repo_url = _get_authed_url(assignment_name, template_org_name, api)
-    with tempfile.TemporaryDirectory() as tmpdir:
-        template_repo = _clone_repo_to(
+    # clone next to the test dir such that test classes can be hard linked
+    with tempfile.TemporaryDirectory(dir=rtd, prefix=".clone-") as tmpdir:
+        template_repo_path = _clone_repo_to(
             repo_url, branch, pathlib.Path(tmpdir) / assignment_name
         )
-        return list(
-            _copy_test_classes(
-                src_dir=pathlib.Path(template_repo.working_tree_dir),
-                dst_dir=assignment_test_dir,
-            )
+        return _copy_test_classes(
+            src_dir=template_repo_path, dst_dir=assignment_test_dir
         )
 
 
 def _copy_test_classes(
     src_dir: pathlib.Path, dst_dir: pathlib.Path
-) -> Iterable[pathlib.Path]:
-    reference_test_classes = src_dir.rglob("*Test.java")
-    for test_class in reference_test_classes:
-        dst = dst_dir / test_class.relative_to(src_dir)
+) -> List[pathlib.Path]:
+    """Copy all test classes in src_dir to the same relative location in
+    dst_dir.
+
+    Returns:
+        Paths to the copied test classes, relative to src_dir.
+    """
+    reference_test_classes = [
+        pathlib.Path(path).relative_to(src_dir)
+        for path in _find_test_class_paths(str(src_dir))
+    ]
+
+    def copy_one(relpath: pathlib.Path) -> None:
+        dst = dst_dir / relpath
         dst.parent.mkdir(exist_ok=True, parents=True)
-        shutil.copy(src=test_class, dst=dst)
-        yield test_class.relative_to(src_dir)
+        _link_or_copy(src=src_dir / relpath, dst=dst)
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=os.cpu_count()
+    ) as executor:
+        list(executor.map(copy_one, reference_test_classes))
+
+    return reference_test_classes
+
+
+def _link_or_copy(src: pathlib.Path, dst: pathlib.Path) -> None:
+    """Hard link src to dst, or copy it if that is not possible (e.g. if the
+    file system does not support hard links).
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src=src, dst=dst)
+
+
+def _find_test_class_paths(root: str) -> Iterable[str]:
+    """Recursively find all files ending in ``Test.java`` in the root
+    directory, skipping hidden and build output directories as these never
+    contain reference tests.
+    """
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if not (
+                    entry.name.startswith(".")
+                    or entry.name in _SKIPPED_DIRNAMES
+                ):
+                    yield from _find_test_class_paths(entry.path)
+            elif entry.name.endswith("Test.java") and entry.is_file():
+                yield entry.path
 
 
 def _clone_repo_to(
     repo_url: str, branch: str, to_path: pathlib.Path
-) -> git.Repo:
+) -> pathlib.Path:
+    """Clone the branch of the repo to the given path.
+
+    Returns:
+        The path to the working tree of the clone.
+    """
     try:
-        template_repo = git.Repo.clone_from(repo_url, to_path)
-        template_repo.git.checkout(branch)
-    except git.CommandError as exc:
-        plug.log.error(exc.stderr)
+        cache = _fetch_to_clone_cache(repo_url, branch)
+        # the working copy borrows objects from the cache, so this is cheap
+        _git(
+            "clone",
+            "--shared",
+            "--single-branch",
+            "--branch",
+            branch,
+            str(cache),
+            str(to_path),
+        )
+    except subprocess.CalledProcessError as exc:
+        plug.log.error(exc.stderr.decode(sys.getdefaultencoding()))
+        raise _CloneError(dir_name=to_path.name, branch=branch) from exc
+    except OSError as exc:
+        # e.g. git is not installed
+        plug.log.error(str(exc))
         raise _CloneError(dir_name=to_path.name, branch=branch) from exc
-    return template_repo
+    return to_path
+
+
+def _fetch_to_clone_cache(repo_url: str, branch: str) -> pathlib.Path:
+    """Fetch the tip of the branch into a bare repository in the clone cache,
+    creating it if it does not already exist.
+
+    The URL is passed directly to fetch and never stored in the cached
+    repository, as it typically contains an access token.
+
+    If fetching into an existing cached repository fails, it is deleted and
+    the fetch is retried once from scratch, such that a broken cache entry
+    (e.g. from an interrupted ``git init``) does not fail every run until it
+    expires.
+
+    Returns:
+        Path to the cached bare repository.
+    """
+    cache = _CLONE_CACHE_DIR / _clone_cache_key(repo_url)
+    if cache.is_dir():
+        try:
+            _fetch_branch(repo_url, branch, cache)
+            return cache
+        except subprocess.CalledProcessError:
+            plug.log.warning(
+                f"failed to fetch into cached clone {cache}, recreating it"
+            )
+            shutil.rmtree(cache, ignore_errors=True)
+
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    _git("init", "--bare", str(cache))
+    _fetch_branch(repo_url, branch, cache)
+    return cache
+
+
+def _fetch_branch(repo_url: str, branch: str, cache: pathlib.Path) -> None:
+    """Fetch the tip of the branch into the cached bare repository, and mark
+    the repository as recently used.
+    """
+    _git(
+        "fetch",
+        "--depth=1",
+        "--no-tags",
+        repo_url,
+        f"+refs/heads/{branch}:refs/heads/{branch}",
+        cwd=cache,
+    )
+    os.utime(cache)
+
+
+def _git(*args: str, cwd: Optional[pathlib.Path] = None) -> None:
+    """Run a git command, raising :py:class:`subprocess.CalledProcessError`
+    with the captured stderr if it fails.
+    """
+    subprocess.run(
+        ["git", *args],
+        cwd=cwd,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+
+
+def _clone_cache_key(repo_url: str) -> str:
+    """Return a cache key for the repo URL, ignoring any credentials in it."""
+    parts = urllib.parse.urlsplit(repo_url)
+    netloc = parts.netloc.rpartition("@")[2]
+    url_without_credentials = urllib.parse.urlunsplit(
+        parts._replace(netloc=netloc)
+    )
+    return hashlib.blake2b(
+        url_without_credentials.encode("utf8"), digest_size=20
+    ).hexdigest()
+
+
+def _sweep_clone_cache() -> None:
+    """Remove cached clones that have not been used in a while."""
+    if not _CLONE_CACHE_DIR.is_dir():
+        return
+
+    expiry = time.time() - _CLONE_CACHE_TTL_SECONDS
+    for cache in _CLONE_CACHE_DIR.iterdir():
+        if cache.stat().st_mtime < expiry:
+            shutil.rmtree(cache, ignore_errors=True)
 
 
 def _get_authed_url(
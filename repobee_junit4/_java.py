@@ -14,16 +14,59 @@ import pathlib
 import re
 import os
 import sys
+import shutil
+import tempfile
 import subprocess
+import functools
+import contextlib
 import collections
-
-from typing import Iterable, Tuple, Union, List
+import concurrent.futures
+
+from typing import (
+    Iterable,
+    Iterator,
+    Tuple,
+    Union,
+    List,
+    Mapping,
+    Pattern,
+    Optional,
+)
 
 import repobee_plug as plug
 from repobee_plug import Status
 
 from repobee_junit4 import SECTION
 from repobee_junit4 import _exception
+from repobee_junit4 import _compile_cache
+
+# (test_class, prod_class, classes_dir)
+CompiledTestClass = Tuple[pathlib.Path, pathlib.Path, pathlib.Path]
+
+# yes, $ is a valid character for a Java identifier ...
+_IDENT = r"[\w$][\w\d_$]*"
+_PACKAGE_PATTERN = re.compile(
+    r"^\s*?package\s+({ident}(\.{ident})*);".format(ident=_IDENT)
+)
+# the package statement and class declaration are typically found within
+# this many bytes from the start of a Java file
+_HEADER_MAX_BYTES = 8 * 1024
+# longer lists of source files are passed to javac in an argfile, to stay
+# well clear of command line length limits (notably ~32K on Windows)
+_MAX_INLINE_SOURCES_LENGTH = 8 * 1024
+# javac runs on a JVM that typically only lives for a second or so, so it is
+# tuned for fast startup rather than peak performance: only the client JIT
+# compiler is used, and the serial collector avoids spinning up GC threads.
+# Unlike test runs, compilation is not subject to a timeout, so this can't
+# affect results
+_JAVAC_JVM_OPTIONS = ("-J-XX:TieredStopAtLevel=1", "-J-XX:+UseSerialGC")
+# directories that are never searched for Java files
+_IGNORED_DIRNAMES = frozenset({".git"})
+# directories that are not searched for student test classes, as they
+# typically hold build output or copies of the sources
+_NON_SOURCE_DIRNAMES = frozenset(
+    {".git", "target", "build", "node_modules", ".gradle"}
+)
 
 
 def is_abstract_class(class_: pathlib.Path) -> bool:
@@ -35,13 +78,8 @@ def is_abstract_class(class_: pathlib.Path) -> bool:
         True if the class is abstract.
     """
     assert class_.name.endswith(".java")
-    regex = r"^\s*?(public\s+)?abstract\s+class\s+{}".format(class_.name[:-5])
-    match = re.search(
-        regex,
-        class_.read_text(encoding=sys.getdefaultencoding()),
-        flags=re.MULTILINE,
-    )
-    return match is not None
+    _, is_abstract = _parse_java_file(class_)
+    return is_abstract
 
 
 def generate_classpath(*paths: pathlib.Path, classpath: str = "") -> str:
@@ -54,11 +92,12 @@ def generate_classpath(*paths: pathlib.Path, classpath: str = "") -> str:
     Returns:
         a formated classpath to be used with ``java`` and ``javac``
     """
-    for path in paths:
-        classpath = "{}:{}".format(path, classpath)
-
-    classpath += ":."
-    return classpath
+    # each path is prepended, so the last one ends up first
+    parts = [str(path) for path in reversed(paths)]
+    if classpath:
+        parts.append(classpath)
+    parts.append(".")
+    return os.pathsep.join(parts)
 
 
 def fqn_from_file(java_filepath: pathlib.Path) -> str:
@@ -79,16 +118,56 @@ def extract_package(class_: pathlib.Path) -> str:
     denotes the default package.
     """
     assert class_.name.endswith(".java")
-    # yes, $ is a valid character for a Java identifier ...
-    ident = r"[\w$][\w\d_$]*"
-    regex = r"^\s*?package\s+({ident}(.{ident})*);".format(ident=ident)
-    with class_.open(encoding=sys.getdefaultencoding(), mode="r") as file:
-        # package statement must be on the first line
-        first_line = file.readline()
-    matches = re.search(regex, first_line)
-    if matches:
-        return matches.group(1)
-    return ""
+    package, _ = _parse_java_file(class_)
+    return package
+
+
+def _parse_java_file(class_: pathlib.Path) -> Tuple[str, bool]:
+    """Return a tuple ``(package, is_abstract)`` for the given Java file."""
+    # the modification time is part of the cache key so that edited files are
+    # parsed anew
+    return _parse_java_file_cached(class_, class_.stat().st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_java_file_cached(
+    class_: pathlib.Path, mtime_ns: int
+) -> Tuple[str, bool]:
+    class_name = class_.name[: -len(".java")]
+    encoding = sys.getdefaultencoding()
+    with class_.open(mode="rb") as file:
+        content = file.read(_HEADER_MAX_BYTES)
+        text = content.decode(encoding, errors="replace")
+        # the class declaration is almost always in the header, but the rest
+        # of the file must be read if it isn't
+        if len(content) == _HEADER_MAX_BYTES and not _class_declaration_regex(
+            class_name
+        ).search(text):
+            content += file.read()
+            text = content.decode(encoding, errors="replace")
+
+    # package statement must be on the first line
+    first_line = text.split("\n", 1)[0]
+    package_match = _PACKAGE_PATTERN.search(first_line)
+    package = package_match.group(1) if package_match else ""
+
+    abstract_match = _abstract_class_regex(class_name).search(text)
+    return package, abstract_match is not None
+
+
+@functools.lru_cache(maxsize=None)
+def _abstract_class_regex(class_name: str) -> Pattern[str]:
+    return re.compile(
+        r"^\s*?(public\s+)?abstract\s+class\s+{}".format(
+            re.escape(class_name)
+        ),
+        flags=re.MULTILINE,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _class_declaration_regex(class_name: str) -> Pattern[str]:
+    return re.compile(r"\bclass\s+{}\b".format(re.escape(class_name)))
 
 
 def fqn(package_name: str, class_name: str) -> str:
@@ -138,7 +217,9 @@ def extract_package_root(class_: pathlib.Path, package: str) -> pathlib.Path:
 
 
 def javac(
-    java_files: Iterable[Union[str, pathlib.Path]], classpath: str
+    java_files: Iterable[Union[str, pathlib.Path]],
+    classpath: str,
+    output_dir: Optional[pathlib.Path] = None,
 ) -> Tuple[str, str]:
     """Run ``javac`` on all of the specified files, assuming that they are
     all ``.java`` files.
@@ -146,18 +227,56 @@ def javac(
     Args:
         java_files: paths to ``.java`` files.
         classpath: The classpath to set.
+        output_dir: Directory to put class files in. If not specified, each
+            class file is put next to its source file.
     Returns:
         (status, msg), where status is e.g. :py:const:`Status.ERROR` and
         the message describes the outcome in plain text.
     """
-    command = ["javac", "-cp", classpath, *[str(path) for path in java_files]]
-    proc = subprocess.run(
-        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-    )
+    command = [_javac_executable(), *_JAVAC_JVM_OPTIONS, "-cp", classpath]
+    if output_dir:
+        command += ["-d", str(output_dir)]
+    source_paths = [str(path) for path in java_files]
+    with contextlib.ExitStack() as stack:
+        if sum(map(len, source_paths)) > _MAX_INLINE_SOURCES_LENGTH:
+            fd, argfile = tempfile.mkstemp(suffix=".txt")
+            stack.callback(os.unlink, argfile)
+            with os.fdopen(fd, mode="w") as file:
+                file.writelines(map(_quote_argfile_arg, source_paths))
+            command.append("@" + argfile)
+        else:
+            command += source_paths
+        return _run_javac(command)
+
+
+def _quote_argfile_arg(arg: str) -> str:
+    """Quote an argument for a javac argfile, in which backslashes are escape
+    characters.
+    """
+    escaped = arg.replace("\\", "\\\\").replace('"', '\\"')
+    return '"{}"\n'.format(escaped)
+
+
+def _run_javac(command: List[str]) -> Tuple[str, str]:
+    # javac reports diagnostics on stderr, which is written to a file rather
+    # than a pipe such that it doesn't need to be drained while javac runs.
+    # With an absolute executable path and close_fds=False, CPython can
+    # launch javac with posix_spawn instead of fork/exec. Not closing fds is
+    # fine as Python creates them as non-inheritable.
+    with tempfile.TemporaryFile() as stderr:
+        proc = subprocess.run(
+            command,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr,
+            close_fds=False,
+        )
+        if proc.returncode != 0:
+            stderr.seek(0)
+            error_output = stderr.read()
 
     if proc.returncode != 0:
         status = Status.ERROR
-        msg = proc.stderr.decode(sys.getdefaultencoding())
+        msg = error_output.decode(sys.getdefaultencoding())
     else:
         msg = "all files compiled successfully"
         status = Status.SUCCESS
@@ -165,11 +284,17 @@ def javac(
     return status, msg
 
 
+@functools.lru_cache(maxsize=None)
+def _javac_executable() -> str:
+    return shutil.which("javac") or "javac"
+
+
 def pairwise_compile(
     test_classes: List[pathlib.Path],
     java_files: List[pathlib.Path],
     classpath: str,
-) -> Tuple[List[plug.Result], List[plug.Result]]:
+    use_cache: bool = True,
+) -> Tuple[List[CompiledTestClass], List[plug.Result]]:
     """Compile test classes with their associated production classes.
 
     For each test class:
@@ -178,48 +303,116 @@ def pairwise_compile(
         2. Compile the test class together with all of the .java files in
         the associated production class' directory.
 
+    All test classes for which a production class is found are first
+    compiled in a single ``javac`` invocation. Only if that fails are they
+    compiled one by one, to find out exactly which of them failed.
+
     Args:
         test_classes: A list of paths to test classes.
         java_files: A list of paths to java files from the student repo.
         classpath: A base classpath to use.
+        use_cache: Whether to use the compile cache. If False, class files
+            are put next to their source files.
     Returns:
-        A tuple of lists of Results on the form ``(succeeded, failed)``
+        A tuple of lists on the form ``(succeeded, failed)``, where
+        ``succeeded`` are tuples ``(test_class, prod_class, classes_dir)``
+        and ``failed`` are Results. ``classes_dir`` is the directory with
+        the test class' class files, or None if they are next to the
+        sources.
     """
     failed = []
     succeeded = []
     # only use concrete test classes
-    concrete_test_classes = filter(
-        lambda t: not is_abstract_class(t), test_classes
-    )
-    for test_class in concrete_test_classes:
-        status, msg, prod_class_path = _pairwise_compile(
-            test_class, classpath, java_files
+    concrete_test_classes = [
+        test_class
+        for test_class in test_classes
+        if not is_abstract_class(test_class)
+    ]
+    prod_class_index = _index_prod_classes(concrete_test_classes, java_files)
+    java_files_by_dir = collections.defaultdict(list)
+    for file in java_files:
+        java_files_by_dir[file.parent].append(file)
+    adjacent_test_classes = {}
+    resolved = [
+        (test_class, *_find_prod_class(test_class, prod_class_index))
+        for test_class in concrete_test_classes
+    ]
+    compilable = {
+        test_class: _adjacent_java_files(
+            test_class,
+            prod_class_path,
+            java_files_by_dir,
+            adjacent_test_classes,
         )
+        for test_class, prod_class_path, _ in resolved
+        if prod_class_path
+    }
+    compile_results = _compile_test_classes(compilable, classpath, use_cache)
+
+    for test_class, prod_class_path, msg in resolved:
+        if not prod_class_path:
+            status = Status.ERROR
+            classes_dir = None
+        else:
+            status, msg, classes_dir = compile_results[test_class]
+
         if status != Status.SUCCESS:
             failed.append(plug.Result(SECTION, status, msg))
         else:
-            succeeded.append((test_class, prod_class_path))
+            succeeded.append((test_class, prod_class_path, classes_dir))
 
     return succeeded, failed
 
 
+def find_java_files(root: Union[str, pathlib.Path]) -> List[pathlib.Path]:
+    """Recursively find all ``.java`` files in the root directory.
+    The ``.git`` directory is not entered.
+
+    Args:
+        root: Path to the repository worktree.
+    Returns:
+        A list of paths to all Java files in the repository.
+    """
+    return list(_walk_java_files(root))
+
+
+def _walk_java_files(root: Union[str, pathlib.Path]) -> Iterator[pathlib.Path]:
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in _IGNORED_DIRNAMES:
+                    yield from _walk_java_files(entry.path)
+            elif entry.name.endswith(".java") and entry.is_file():
+                yield pathlib.Path(entry.path)
+
+
 def get_student_test_classes(
-    path: pathlib.Path, reference_test_classes: List[pathlib.Path]
+    path: pathlib.Path,
+    java_files: List[pathlib.Path],
+    reference_test_classes: List[pathlib.Path],
 ) -> List[pathlib.Path]:
     """Return paths to all files that match the test classes in the
     provided list. Raises if there is more than one or no matches for any
-    of the files.
+    of the files. Files in build output directories (such as ``target``)
+    are not considered.
 
     Args:
         path: Path to the repository worktree.
+        java_files: All Java files in the student repository, as found by
+            :py:func:`find_java_files`.
         reference_test_classes: A list of paths to reference test classes.
             These are assumed to be unique.
     Returns:
         A list of paths to test classes corresponding to the ones in the input
         list, but in the student repository.
     """
-    filenames = {f.name for f in reference_test_classes}
-    matches = [file for file in path.rglob("*") if file.name in filenames]
+    filenames = frozenset(f.name for f in reference_test_classes)
+    matches = [
+        file
+        for file in java_files
+        if file.name in filenames
+        and _NON_SOURCE_DIRNAMES.isdisjoint(file.relative_to(path).parts)
+    ]
     _check_exact_matches(reference_test_classes, matches)
     return matches
 
@@ -268,34 +461,108 @@ def _check_exact_matches(
         raise _exception.JavaError("Package statement mismatch: " + errors)
 
 
-def _pairwise_compile(test_class, classpath, java_files):
-    """Compile the given test class together with its production class
-    counterpoint (if it can be found). Return a tuple of (status, msg).
+def _find_prod_class(test_class, prod_class_index):
+    """Find the production class counterpoint of the given test class.
+    Return a tuple of (prod_class_path, msg), where prod_class_path is None
+    and msg describes the problem if there is not exactly one match.
     """
     package = extract_package(test_class)
-    potential_prod_classes = _get_matching_prod_classes(
-        test_class, package, java_files
+    prod_class_name = _prod_class_name(test_class)
+    potential_prod_classes = prod_class_index.get(
+        (package, prod_class_name), []
     )
 
     if len(potential_prod_classes) != 1:
-        status = Status.ERROR
         msg = (
             "no production class found for "
             if not potential_prod_classes
             else "multiple production classes found for "
         ) + fqn(package, test_class.name)
-        prod_class_path = None
-    else:
-        prod_class_path = potential_prod_classes[0]
-        adjacent_java_files = [
-            file
-            for file in prod_class_path.parent.glob("*.java")
-            if not file.name.endswith("Test.java")
-        ] + list(test_class.parent.glob("*Test.java"))
-        status, msg = javac(
-            [*adjacent_java_files], generate_classpath(classpath=classpath)
+        return None, msg
+    return potential_prod_classes[0], None
+
+
+def _compile_test_classes(
+    compilable: Mapping[pathlib.Path, List[pathlib.Path]],
+    classpath: str,
+    use_cache: bool = True,
+) -> Mapping[pathlib.Path, Tuple[str, str, Optional[pathlib.Path]]]:
+    """Compile each test class together with its adjacent Java files. Class
+    files are put in the compile cache, and compilation is skipped entirely
+    for files that are already in it.
+
+    All files are first compiled in a single ``javac`` invocation. If that
+    fails, each test class is compiled separately (and concurrently) to find
+    out exactly which ones failed. In the latter case, each test class gets
+    its own classes directory, as the separately compiled files may have
+    clashing names.
+
+    Args:
+        compilable: A mapping from test classes to the Java files to compile
+            them with.
+        classpath: A base classpath to use.
+        use_cache: Whether to use the compile cache. If False, class files
+            are put next to their source files, and ``classes_dir`` is None.
+    Returns:
+        A mapping from test classes to ``(status, msg, classes_dir)`` tuples.
+    """
+    classpath = generate_classpath(classpath=classpath)
+
+    def compile_cached(java_files):
+        if not use_cache:
+            return (*javac(java_files, classpath), None)
+        return _compile_cache.cached_compile(
+            java_files,
+            classpath,
+            functools.partial(javac, java_files, classpath),
         )
-    return status, msg, prod_class_path
+
+    if len(compilable) > 1:
+        files_to_compile = {
+            file for java_files in compilable.values() for file in java_files
+        }
+        status, msg, classes_dir = compile_cached(files_to_compile)
+        if status == Status.SUCCESS:
+            return {
+                test_class: (status, msg, classes_dir)
+                for test_class in compilable
+            }
+
+    # without the cache, test classes that share adjacent files would write
+    # the same class files next to the sources, so they are compiled in turn
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=os.cpu_count() if use_cache else 1
+    ) as executor:
+        results = executor.map(compile_cached, compilable.values())
+        return dict(zip(compilable.keys(), results))
+
+
+def _adjacent_java_files(
+    test_class, prod_class_path, java_files_by_dir, adjacent_test_classes
+):
+    """Return the .java files that should be compiled with the test class,
+    that is to say the production classes in the production class'
+    directory and the test classes in the test class' directory.
+
+    ``java_files_by_dir`` maps directories in the student repo to the Java
+    files in them, such that the production class' directory need not be
+    listed again. ``adjacent_test_classes`` maps test class directories to
+    the test classes in them, and is filled in as directories are listed.
+    """
+    prod_classes = [
+        file
+        for file in java_files_by_dir[prod_class_path.parent]
+        if not file.name.endswith("Test.java")
+    ]
+    test_dir = test_class.parent
+    if test_dir not in adjacent_test_classes:
+        with os.scandir(test_dir) as entries:
+            adjacent_test_classes[test_dir] = [
+                pathlib.Path(entry.path)
+                for entry in entries
+                if entry.name.endswith("Test.java") and entry.is_file()
+            ]
+    return prod_classes + adjacent_test_classes[test_dir]
 
 
 def _extract_duplicates(files: List[pathlib.Path]) -> List[pathlib.Path]:
@@ -303,16 +570,24 @@ def _extract_duplicates(files: List[pathlib.Path]) -> List[pathlib.Path]:
     return [path for path, count in counts.items() if count > 1]
 
 
-def _get_matching_prod_classes(test_class, package, java_files):
-    """Find all production classes among the Java files that math the test
-    classes name and the package.
+def _index_prod_classes(
+    test_classes: List[pathlib.Path], java_files: List[pathlib.Path]
+) -> Mapping[Tuple[str, str], List[pathlib.Path]]:
+    """Index the Java files that may be production classes for the test
+    classes by ``(package, filename)``. Files that can't match any of the
+    test classes by name are not indexed, and so their packages are never
+    read.
     """
-    prod_class_name = test_class.name.replace("Test.java", ".java")
-    return [
-        file
-        for file in java_files
-        if file.name == prod_class_name and extract_package(file) == package
-    ]
+    prod_class_names = {_prod_class_name(t) for t in test_classes}
+    index = collections.defaultdict(list)
+    for file in java_files:
+        if file.name in prod_class_names:
+            index[(extract_package(file), file.name)].append(file)
+    return index
+
+
+def _prod_class_name(test_class: pathlib.Path) -> str:
+    return test_class.name.replace("Test.java", ".java")
 
 
 def _check_directory_corresponds_to_package(path: pathlib.Path, package: str):
@@ -4,8 +4,14 @@ import re
 import sys
 import subprocess
 import os
+import time
+import signal
+import atexit
+import functools
+import threading
 import contextlib
-from typing import Optional
+import collections
+from typing import Optional, List, IO, Deque, Pattern
 
 import daiquiri
 
@@ -16,6 +22,17 @@ from repobee_junit4 import _output
 LOGGER = daiquiri.getLogger(__file__)
 HAMCREST_JAR_PATTERN = rf"([^{os.pathsep}]*hamcrest-core-1.3.jar)"
 JUNIT4_JAR_PATTERN = rf"([^{os.pathsep}]*junit-4\.\d+\.(\d+\.)?jar)"
+HAMCREST_JAR_REGEX = re.compile(HAMCREST_JAR_PATTERN)
+JUNIT4_JAR_REGEX = re.compile(JUNIT4_JAR_PATTERN)
+
+# the amount of output kept from each of stdout and stderr of a test run
+MAX_OUTPUT_BYTES = 64 * 1024
+_READ_CHUNK_SIZE = 8 * 1024
+
+# the serial collector avoids spinning up GC threads for short test runs.
+# The JIT is deliberately left at its defaults, as limiting it would slow
+# down CPU-bound student code and could turn passing tests into timeouts
+_JVM_STARTUP_OPTIONS = ("-XX:+UseSerialGC",)
 
 _DEFAULT_SECURITY_POLICY_TEMPLATE = """grant {{
 }};
@@ -28,8 +45,9 @@ grant codeBase "file:{junit4_jar_path}" {{
 @contextlib.contextmanager
 def security_policy(classpath: str, active: bool):
     """Yield the path to the default security policy file if ``active``,
-    else yield None. The policy file is deleted once the context is
-    exited.
+    else yield None. The policy file is written once per distinct policy and
+    reused for the remainder of the process, and is deleted when the
+    interpreter exits.
 
     TODO: Make it possible to use a custom security policy here.
     """
@@ -41,26 +59,52 @@ def security_policy(classpath: str, active: bool):
         yield
         return
 
-    with tempfile.NamedTemporaryFile() as security_policy_file:
-        policy = _generate_default_security_policy(classpath)
+    policy = _generate_default_security_policy(classpath)
+    yield _write_security_policy(policy)
+
+
+@functools.lru_cache(maxsize=None)
+def _write_security_policy(policy: str) -> pathlib.Path:
+    fd, path = tempfile.mkstemp(prefix="repobee-junit4-", suffix=".policy")
+    with os.fdopen(fd, mode="wb") as security_policy_file:
         security_policy_file.write(
             policy.encode(encoding=sys.getdefaultencoding())
         )
-        security_policy_file.flush()
-        yield pathlib.Path(security_policy_file.name)
+    atexit.register(_remove_file, path)
+    return pathlib.Path(path)
+
+
+def _remove_file(path: str) -> None:
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
 
 
 def _generate_default_security_policy(classpath: str) -> str:
     """Generate the default security policy from the classpath. JUnit4 jar must
     be on the classpath.
     """
-    junit_jar_matches = re.search(JUNIT4_JAR_PATTERN, classpath)
-    if not junit_jar_matches:
+    path = _find_classpath_entry(JUNIT4_JAR_REGEX, classpath)
+    if not path:
         raise ValueError("junit4 jar not on the classpath")
-    path = junit_jar_matches.group(0)
     return _DEFAULT_SECURITY_POLICY_TEMPLATE.format(junit4_jar_path=path)
 
 
+def _find_classpath_entry(
+    regex: Pattern[str], classpath: str
+) -> Optional[str]:
+    """Return the first entry on the classpath that fully matches the regex,
+    or None if there is no such entry.
+    """
+    return next(
+        (
+            entry
+            for entry in classpath.split(os.pathsep)
+            if regex.fullmatch(entry)
+        ),
+        None,
+    )
+
+
 def _extract_conforming_package(test_class, prod_class):
     """Extract a package name from the test and production class.
     Raise if the test class and production class have different package
@@ -84,6 +128,7 @@ def run_test_class(
     classpath: str,
     timeout: int,
     security_policy: Optional[pathlib.Path] = None,
+    classes_dir: Optional[pathlib.Path] = None,
 ) -> _output.TestResult:
     """Run a single test class on a single production class.
 
@@ -94,6 +139,8 @@ def run_test_class(
         timeout: Maximum amount of time the test class is allowed to run, in
             seconds.
         security_policy: A JVM security policy to apply during test execution.
+        classes_dir: Directory with the compiled classes, if they are not
+            next to the source files.
     Returns:
         Test results.
     """
@@ -104,11 +151,12 @@ def run_test_class(
 
     test_class_name = _java.fqn_from_file(test_class)
 
-    classpath = _java.generate_classpath(
-        test_class_dir, prod_class_dir, classpath=classpath
-    )
+    classpath_dirs = [test_class_dir, prod_class_dir]
+    if classes_dir:
+        classpath_dirs.append(classes_dir)
+    classpath = _java.generate_classpath(*classpath_dirs, classpath=classpath)
 
-    command = ["java", "-enableassertions"]
+    command = ["java", "-enableassertions", *_JVM_STARTUP_OPTIONS]
     if security_policy:
         command += [
             "-Djava.security.manager",
@@ -122,14 +170,88 @@ def run_test_class(
     ]
 
     try:
-        proc = subprocess.run(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=timeout,
-        )
+        proc = _run_with_bounded_output(command, timeout=timeout)
         return _output.TestResult.build(test_class=test_class, proc=proc)
     except subprocess.TimeoutExpired as exc:
         return _output.TestResult.timed_out(
             test_class=test_class, timeout=exc.timeout
         )
+
+
+def _run_with_bounded_output(
+    command: List[str], timeout: int
+) -> subprocess.CompletedProcess:
+    """Run the command, keeping only the last
+    :py:const:`MAX_OUTPUT_BYTES` bytes of stdout and stderr, respectively.
+    Test classes that spew output would otherwise have all of it buffered in
+    memory. Like :py:func:`subprocess.run`, the process is killed and
+    :py:class:`subprocess.TimeoutExpired` raised if it, or any process it
+    started that keeps its output open, runs past the timeout.
+    """
+    deadline = time.monotonic() + timeout
+    with subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    ) as proc:
+        stdout_tail = collections.deque()
+        stderr_tail = collections.deque()
+        drainers = [
+            threading.Thread(
+                target=_drain, args=(proc.stdout, stdout_tail), daemon=True
+            ),
+            threading.Thread(
+                target=_drain, args=(proc.stderr, stderr_tail), daemon=True
+            ),
+        ]
+        for drainer in drainers:
+            drainer.start()
+
+        try:
+            proc.wait(timeout=timeout)
+            for drainer in drainers:
+                drainer.join(timeout=max(0.0, deadline - time.monotonic()))
+            if any(drainer.is_alive() for drainer in drainers):
+                # the test class left a process behind that holds the pipes
+                raise subprocess.TimeoutExpired(command, timeout)
+        except subprocess.TimeoutExpired:
+            _kill_process_group(proc)
+            # unblocks the drainers even if a process outside the group
+            # still holds the pipes
+            proc.stdout.close()
+            proc.stderr.close()
+            raise
+
+        return subprocess.CompletedProcess(
+            args=command,
+            returncode=proc.returncode,
+            stdout=b"".join(stdout_tail),
+            stderr=b"".join(stderr_tail),
+        )
+
+
+def _kill_process_group(proc: subprocess.Popen) -> None:
+    """Kill the process and every process it started in its session."""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _drain(pipe: IO[bytes], tail: Deque[bytes]) -> None:
+    """Read the pipe until EOF or until it is closed, keeping only the last
+    :py:const:`MAX_OUTPUT_BYTES` bytes in the tail. The unbuffered raw file
+    is read such that closing the pipe from another thread does not block
+    on the buffer's lock.
+    """
+    size = 0
+    try:
+        for chunk in iter(lambda: pipe.raw.read(_READ_CHUNK_SIZE), b""):
+            tail.append(chunk)
+            size += len(chunk)
+            while size - len(tail[0]) >= MAX_OUTPUT_BYTES:
+                size -= len(tail.popleft())
+    except (OSError, ValueError):
+        # the pipe was closed as the process timed out
+        pass
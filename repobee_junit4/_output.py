@@ -9,11 +9,12 @@
 import sys
 import os
 import re
-import collections
+import dataclasses
+import itertools
 import pathlib
 import subprocess
 import math
-from typing import Optional
+from typing import Optional, Tuple, List, Pattern
 
 from colored import bg, Style
 
@@ -21,17 +22,27 @@ from repobee_junit4 import _java
 
 SUCCESS_COLOR = bg("dark_green")
 FAILURE_COLOR = bg("yellow")
+_COMPILE_ERROR_PREFIX = "{}Compile error:{} ".format(bg("red"), Style.RESET)
 
 DEFAULT_LINE_LENGTH_LIMIT = 150
 DEFAULT_MAX_LINES = 10
 
+# always UTF-8 on Python 3, so there is no need to look it up for each test
+_DEFAULT_ENCODING = sys.getdefaultencoding()
 
-class TestResult(
-    collections.namedtuple(
-        "TestResult",
-        "fqn success num_failed num_passed test_failures timeout".split(),
-    )
-):
+_TRUNC_MSG = " #[...]# "
+
+# the counts in the summary printed by JUnit4, as pairs of a literal prefix
+# to search for and a regex to match at its position. They are matched
+# against the raw output, which need only be decoded if there are failure
+# descriptions to extract
+_FAILED_COUNT = (b"Failures: ", re.compile(rb"Failures: (\d+)"))
+_OK_COUNT = (b"OK (", re.compile(rb"OK \((\d+) tests\)"))
+_RUN_COUNT = (b"Tests run: ", re.compile(rb"Tests run: (\d+)"))
+
+
+@dataclasses.dataclass(frozen=True)
+class TestResult:
     """An immutable class for storing test results. Outside callers should use
     the static build methods :py:meth:`TestResult.build` or
     :py:meth:`TestResult.timed_out` to create instances.
@@ -46,6 +57,22 @@ class TestResult(
             class timed out, or None if it did not time out.
     """
 
+    __slots__ = (
+        "fqn",
+        "success",
+        "num_failed",
+        "num_passed",
+        "test_failures",
+        "timeout",
+    )
+
+    fqn: str
+    success: bool
+    num_failed: int
+    num_passed: int
+    test_failures: List[str]
+    timeout: Optional[int]
+
     @staticmethod
     def build(
         test_class: pathlib.Path, proc: subprocess.CompletedProcess
@@ -58,13 +85,26 @@ class TestResult(
         Returns:
             A TestResult instance representing the test run.
         """
-        stdout = proc.stdout.decode(encoding=sys.getdefaultencoding())
+        num_passed, num_failed = _parse_summary(proc.stdout)
+        success = proc.returncode == 0
+        # failure descriptions are only ever shown for unsuccessful runs. The
+        # output is a bounded tail that may start mid-character, so decoding
+        # must not be strict
+        test_failures = (
+            []
+            if success
+            else _parse_failed_tests(
+                proc.stdout.decode(
+                    encoding=_DEFAULT_ENCODING, errors="replace"
+                )
+            )
+        )
         return TestResult(
             fqn=_java.fqn_from_file(test_class),
-            success=proc.returncode == 0,
-            num_failed=_get_num_failed(stdout),
-            num_passed=_get_num_passed(stdout),
-            test_failures=_parse_failed_tests(stdout),
+            success=success,
+            num_failed=num_failed,
+            num_passed=num_passed,
+            test_failures=test_failures,
             timeout=None,
         )
 
@@ -102,33 +142,79 @@ class TestResult(
         return msg
 
 
-def _get_num_failed(test_output: str) -> int:
-    """Get the amount of failed tests from the error output of JUnit4."""
-    match = re.search(r"Failures: (\d+)", test_output)
-    return int(match.group(1)) if match else 0
-
+def _parse_summary(test_output: bytes) -> Tuple[int, int]:
+    """Get the amount of passed and failed tests from the output of JUnit4.
 
-def _get_num_tests(test_output: str) -> int:
-    """Get the total amount of tests. Only use this if there were test
-    failures!
+    Returns:
+        A tuple ``(num_passed, num_failed)``.
     """
-    match = re.search(r"Tests run: (\d+)", test_output)
-    return int(match.group(1)) if match else 0
-
+    num_failed = _find_count(test_output, *_FAILED_COUNT) or 0
+    num_ok = _find_count(test_output, *_OK_COUNT)
+    if num_ok is not None:
+        return num_ok, num_failed
+    # there were failures
+    num_run = _find_count(test_output, *_RUN_COUNT) or 0
+    return num_run - num_failed, num_failed
+
+
+def _find_count(
+    test_output: bytes, prefix: bytes, regex: Pattern[bytes]
+) -> Optional[int]:
+    """Return the count captured by the first match of the regex, or None if
+    it does not match. Candidates are located with a plain substring search
+    for the prefix, which is much faster than searching with the regex.
+    """
+    start = test_output.find(prefix)
+    while start != -1:
+        match = regex.match(test_output, start)
+        if match:
+            return int(match.group(1))
+        start = test_output.find(prefix, start + 1)
+    return None
 
-def _get_num_passed(test_output: str) -> int:
-    """Get the amount of passed tests from the output of JUnit4."""
-    match = re.search(r"OK \((\d+) tests\)", test_output)
-    if not match:  # there were failures
-        return _get_num_tests(test_output) - _get_num_failed(test_output)
-    return int(match.group(1))
 
+def _parse_failed_tests(test_output: str) -> List[str]:
+    """Return a list of test failure descriptions, excluding stack traces.
 
-def _parse_failed_tests(test_output: str) -> str:
-    """Return a list of test failure descriptions, excluding stack traces."""
-    return re.findall(
-        r"^\d\) .*(?:\n(?!\s+at).*)*", test_output, flags=re.MULTILINE
-    )
+    A description starts at a line on the form ``<n>) <test>`` and spans all
+    following lines up until the first stack trace line (i.e. an indented
+    line starting with ``at``).
+    """
+    lines = test_output.split("\n")
+    failures = []
+    current = None
+    for i, line in enumerate(lines):
+        if current is not None:
+            if _starts_stack_trace(lines, i):
+                failures.append("\n".join(current))
+                current = None
+            else:
+                current.append(line)
+        elif _is_failure_header(line):
+            current = [line]
+
+    if current is not None:
+        failures.append("\n".join(current))
+    return failures
+
+
+def _is_failure_header(line: str) -> bool:
+    num_digits = len(line) - len(line.lstrip("0123456789"))
+    return num_digits > 0 and line.startswith(") ", num_digits)
+
+
+def _starts_stack_trace(lines: List[str], start: int) -> bool:
+    """Check if a stack trace starts at the given line, skipping any blank
+    lines before it.
+    """
+    for i in range(start, len(lines)):
+        stripped = lines[i].lstrip()
+        if stripped:
+            # stack trace lines are indented, but preceding blank lines count
+            # as indentation
+            indented = i > start or len(stripped) < len(lines[i])
+            return indented and stripped.startswith("at")
+    return False
 
 
 def test_result_header(
@@ -151,7 +237,7 @@ def test_result_header(
 
 def format_results(test_results, compile_failed, verbose, very_verbose):
     def format_compile_error(res):
-        msg = "{}Compile error:{} {}".format(bg("red"), Style.RESET, res.msg)
+        msg = _COMPILE_ERROR_PREFIX + res.msg
         if very_verbose:
             return msg
         elif verbose:
@@ -160,20 +246,26 @@ def format_results(test_results, compile_failed, verbose, very_verbose):
             return msg.split("\n")[0]
 
     def format_test_result(res):
-        msg = res.pretty_result(verbose or very_verbose)
         if very_verbose:
-            return msg
+            return res.pretty_result(verbose=True)
         elif verbose:
+            msg = res.pretty_result(verbose=True)
             return _truncate_lines(msg, max_lines=sys.maxsize)
         else:
-            return msg.split("\n")[0]
+            # the non-verbose result is just the single header line
+            return res.pretty_result(verbose=False)
 
-    compile_error_messages = list(map(format_compile_error, compile_failed))
-    test_messages = list(map(format_test_result, test_results))
-    msg = os.linesep.join(compile_error_messages + test_messages)
-    if test_messages:
-        num_passed = sum([res.num_passed for res in test_results])
-        num_failed = sum([res.num_failed for res in test_results])
+    msg = os.linesep.join(
+        itertools.chain(
+            map(format_compile_error, compile_failed),
+            map(format_test_result, test_results),
+        )
+    )
+    if test_results:
+        num_passed = num_failed = 0
+        for res in test_results:
+            num_passed += res.num_passed
+            num_failed += res.num_failed
         total = num_passed + num_failed
         msg = (
             "Test summary: Passed {}/{} of all executed tests{}".format(
@@ -190,22 +282,25 @@ def _truncate_lines(
     max_lines: int = DEFAULT_MAX_LINES,
 ):
     """Truncate lines to max_len characters."""
-    trunc_msg = " #[...]# "
-    if max_len <= len(trunc_msg):
+    if max_len <= len(_TRUNC_MSG):
         raise ValueError(
-            "max_len must be greater than {}".format(len(trunc_msg))
+            "max_len must be greater than {}".format(len(_TRUNC_MSG))
         )
 
-    effective_len = max_len - len(trunc_msg)
-    head_len = effective_len // 2
-    tail_len = effective_len // 2
-
-    def truncate(s):
-        if len(s) > max_len:
-            return s[:head_len] + trunc_msg + s[-tail_len:]
-        return s
-
-    lines = [truncate(line) for line in string.split(os.linesep)]
+    part_len = (max_len - len(_TRUNC_MSG)) // 2
+    # splitting on "\n" also handles os.linesep as any "\r" is kept at the
+    # end of its line and restored by the join. Lines past max_lines are
+    # dropped anyway, so there is no need to split them off.
+    lines = string.split("\n", max_lines)
     if len(lines) > max_lines:
-        lines = lines[: max_lines - 1] + [trunc_msg]
-    return os.linesep.join(lines)
+        lines = lines[: max_lines - 1] + [_TRUNC_MSG]
+    return "\n".join(
+        [
+            (
+                line
+                if len(line) <= max_len
+                else line[:part_len] + _TRUNC_MSG + line[-part_len:]
+            )
+            for line in lines
+        ]
+    )
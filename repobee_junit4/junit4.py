@@ -18,9 +18,11 @@ discovered in student repositories. See the README for more details.
 """
 
 import os
+import argparse
 import pathlib
-import re
-from typing import Tuple, List
+import functools
+import concurrent.futures
+from typing import Tuple, List, Pattern, FrozenSet, Optional
 
 
 import daiquiri
@@ -36,13 +38,22 @@ from repobee_junit4._generate_rtd import GenerateRTD  # noqa: F401
 
 LOGGER = daiquiri.getLogger(__file__)
 
-ResultPair = Tuple[pathlib.Path, pathlib.Path]
-
 DEFAULT_TIMEOUT = 10
+DEFAULT_JOBS = 1
 
 CLASSPATH = os.getenv("CLASSPATH") or ""
 
 
+def _positive_int(value: str) -> int:
+    """Convert a command line value to an int that is at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(
+            "must be at least 1, got {}".format(number)
+        )
+    return number
+
+
 class JUnit4Hooks(plug.Plugin, plug.cli.CommandExtension):
     __settings__ = plug.cli.command_extension_settings(
         actions=[plug.cli.CoreCommand.repos.clone]
@@ -60,13 +71,13 @@ class JUnit4Hooks(plug.Plugin, plug.cli.CommandExtension):
 
     junit4_hamcrest_path = plug.cli.option(
         help="absolute path to the hamcrest library",
-        required=not re.search(_junit4_runner.JUNIT4_JAR_PATTERN, CLASSPATH),
+        required=not _junit4_runner.JUNIT4_JAR_REGEX.search(CLASSPATH),
         configurable=True,
     )
 
     junit4_junit_path = plug.cli.option(
         help="absolute path to the junit4 library",
-        required=not re.search(_junit4_runner.JUNIT4_JAR_PATTERN, CLASSPATH),
+        required=not _junit4_runner.JUNIT4_JAR_REGEX.search(CLASSPATH),
         configurable=True,
     )
 
@@ -75,6 +86,11 @@ class JUnit4Hooks(plug.Plugin, plug.cli.CommandExtension):
         "(student code can do whatever)"
     )
 
+    junit4_disable_compile_cache = plug.cli.flag(
+        help="don't reuse class files compiled in earlier runs, and don't "
+        "store any for later runs"
+    )
+
     verbosity = plug.cli.mutually_exclusive_group(
         junit4_verbose=plug.cli.flag(
             help="display more information about test failures"
@@ -89,6 +105,11 @@ class JUnit4Hooks(plug.Plugin, plug.cli.CommandExtension):
         "test classes from the reference tests directory"
     )
 
+    junit4_fail_fast = plug.cli.flag(
+        help="don't run any tests in a student repo with compile errors, and "
+        "stop running tests in a repo as soon as a test class fails"
+    )
+
     junit4_timeout = plug.cli.option(
         help="maximum amount of seconds a test class is allowed to run "
         "before timing out",
@@ -97,6 +118,15 @@ class JUnit4Hooks(plug.Plugin, plug.cli.CommandExtension):
         converter=int,
     )
 
+    junit4_jobs = plug.cli.option(
+        help="maximum amount of test classes to run concurrently in each "
+        "student repo (note that the timeout applies to each test class, so "
+        "running many at once on a loaded machine can cause timeouts)",
+        configurable=True,
+        default=DEFAULT_JOBS,
+        converter=_positive_int,
+    )
+
     def post_clone(
         self, repo: plug.StudentRepo, api: plug.PlatformAPI
     ) -> plug.Result:
@@ -114,7 +144,9 @@ class JUnit4Hooks(plug.Plugin, plug.cli.CommandExtension):
             a plug.Result specifying the outcome.
         """
 
-        self._check_jars_exist()
+        _check_jars_exist(
+            self.junit4_junit_path, self.junit4_hamcrest_path, CLASSPATH
+        )
 
         if not pathlib.Path(self.junit4_reference_tests_dir).is_dir():
             raise plug.PlugError(
@@ -131,7 +163,11 @@ class JUnit4Hooks(plug.Plugin, plug.cli.CommandExtension):
                 )
 
             compile_succeeded, compile_failed = self._compile_all(repo)
-            test_results = self._run_tests(compile_succeeded)
+            test_results = (
+                []
+                if compile_failed and self.junit4_fail_fast
+                else self._run_tests(compile_succeeded)
+            )
 
             has_failures = compile_failed or any(
                 map(lambda r: not r.success, test_results)
@@ -162,30 +198,40 @@ class JUnit4Hooks(plug.Plugin, plug.cli.CommandExtension):
 
     def _compile_all(
         self, repo: plug.StudentRepo
-    ) -> Tuple[List[ResultPair], List[plug.Result]]:
+    ) -> Tuple[List[_java.CompiledTestClass], List[plug.Result]]:
         """Attempt to compile all java files in the repo.
 
         Returns:
             a tuple of lists ``(succeeded, failed)``, where ``succeeded``
-            are tuples on the form ``(test_class, prod_class)`` paths.
+            are tuples on the form ``(test_class, prod_class, classes_dir)``.
         """
-        java_files = [
-            file for file in repo.path.rglob("*.java") if file.is_file()
-        ]
+        java_files = _java.find_java_files(repo.path)
         assignment_name = self._extract_assignment_name(repo.name)
         reference_test_classes = self._find_test_classes(assignment_name)
         test_classes = (
-            _java.get_student_test_classes(repo.path, reference_test_classes)
+            _java.get_student_test_classes(
+                repo.path, java_files, reference_test_classes
+            )
             if self.junit4_run_student_tests
             else reference_test_classes
         )
         compile_succeeded, compile_failed = _java.pairwise_compile(
-            test_classes, java_files, classpath=self._generate_classpath()
+            test_classes,
+            java_files,
+            classpath=self._generate_classpath(),
+            use_cache=not self.junit4_disable_compile_cache,
         )
         return compile_succeeded, compile_failed
 
     def _extract_assignment_name(self, repo_name: str) -> str:
-        matches = list(filter(repo_name.endswith, self.args.assignments))
+        assignment_names = self._assignment_names()
+        # a single C-level check rules out repos without any match, and only
+        # repos with a match are scanned for which names match
+        matches = (
+            [name for name in assignment_names if repo_name.endswith(name)]
+            if repo_name.endswith(assignment_names)
+            else []
+        )
 
         if len(matches) == 1:
             return matches[0]
@@ -200,6 +246,16 @@ class JUnit4Hooks(plug.Plugin, plug.cli.CommandExtension):
             res = plug.Result(SECTION, plug.Status.ERROR, msg)
             raise _exception.ActError(res)
 
+    def _assignment_names(self) -> Tuple[str, ...]:
+        """Return the assignment names as a tuple, which is only built once
+        for each set of parsed arguments.
+        """
+        cached = getattr(self, "_cached_assignment_names", None)
+        if cached is None or cached[0] is not self.args:
+            cached = (self.args, tuple(self.args.assignments))
+            self._cached_assignment_names = cached
+        return cached[1]
+
     def _find_test_classes(self, assignment_name) -> List[pathlib.Path]:
         """Find all test classes (files ending in ``Test.java``) in directory
         at <reference_tests_dir>/<assignment_name>.
@@ -223,12 +279,11 @@ class JUnit4Hooks(plug.Plugin, plug.cli.CommandExtension):
             )
             raise _exception.ActError(res)
 
-        test_classes = [
-            file
-            for file in test_dir.rglob("*.java")
-            if file.name.endswith("Test.java")
-            and file.name not in (self.junit4_ignore_tests or [])
-        ]
+        test_classes = list(
+            _scan_reference_tests(
+                test_dir, frozenset(self.junit4_ignore_tests or [])
+            )
+        )
 
         if not test_classes:
             res = plug.Result(
@@ -243,82 +298,133 @@ class JUnit4Hooks(plug.Plugin, plug.cli.CommandExtension):
         return test_classes
 
     def _run_tests(
-        self, test_prod_class_pairs: ResultPair
-    ) -> _output.TestResult:
-        """Run tests and return the results.
+        self, compiled_test_classes: List[_java.CompiledTestClass]
+    ) -> List[_output.TestResult]:
+        """Run tests and return the results. Test classes are run
+        concurrently, but the results are in the same order as the input.
 
         Args:
-            test_prod_class_pairs: A list of tuples on the form
-            ``(test_class_path, prod_class_path)``
+            compiled_test_classes: A list of tuples on the form
+            ``(test_class_path, prod_class_path, classes_dir)``
 
         Returns:
             A TestResult for each test class run.
         """
-        results = []
         classpath = self._generate_classpath()
         with _junit4_runner.security_policy(
             classpath, active=not self.junit4_disable_security
         ) as security_policy:
-            for test_class, prod_class in test_prod_class_pairs:
-                test_result = _junit4_runner.run_test_class(
+
+            def run(compiled_test_class):
+                test_class, prod_class, classes_dir = compiled_test_class
+                return _junit4_runner.run_test_class(
                     test_class,
                     prod_class,
                     classpath=classpath,
                     security_policy=security_policy,
                     timeout=self.junit4_timeout,
+                    classes_dir=classes_dir,
                 )
-                results.append(test_result)
-            return results
 
-    def _generate_classpath(self, *paths: pathlib.Path) -> str:
+            # each test class runs in its own JVM, so threads suffice
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.junit4_jobs
+            ) as executor:
+                futures = [
+                    executor.submit(run, compiled_test_class)
+                    for compiled_test_class in compiled_test_classes
+                ]
+                results = []
+                for future in futures:
+                    result = future.result()
+                    results.append(result)
+                    if self.junit4_fail_fast and not result.success:
+                        executor.shutdown(wait=True, cancel_futures=True)
+                        break
+                return results
+
+    def _generate_classpath(self) -> str:
         """
-        Args:
-            paths: One or more paths to add to the classpath.
         Returns:
             a formated classpath to be used with ``java`` and ``javac``
         """
-        warn = (
-            "`{}` is not configured and not on the CLASSPATH variable."
-            "This will probably crash."
-        )
-        if not (
-            self.junit4_hamcrest_path
-            or re.search(_junit4_runner.HAMCREST_JAR_PATTERN, CLASSPATH)
-        ):
-            LOGGER.warning(warn.format("hamcrest"))
-        if not (
-            self.junit4_junit_path
-            or re.search(_junit4_runner.JUNIT4_JAR_PATTERN, CLASSPATH)
-        ):
-            LOGGER.warning(warn.format("junit4"))
-
-        paths = list(paths)
-        if self.junit4_hamcrest_path:
-            paths.append(self.junit4_hamcrest_path)
-        if self.junit4_junit_path:
-            paths.append(self.junit4_junit_path)
-        return _java.generate_classpath(*paths, classpath=CLASSPATH)
-
-    def _check_jars_exist(self):
-        """Check that the specified jar files actually exist."""
-        junit_path = self.junit4_junit_path or _parse_from_classpath(
-            _junit4_runner.JUNIT4_JAR_PATTERN, CLASSPATH
+        return _generate_classpath(
+            self.junit4_hamcrest_path, self.junit4_junit_path, CLASSPATH
         )
-        hamcrest_path = self.junit4_hamcrest_path or _parse_from_classpath(
-            _junit4_runner.HAMCREST_JAR_PATTERN, CLASSPATH
-        )
-        for raw_path in (junit_path, hamcrest_path):
-            if not pathlib.Path(raw_path).is_file():
-                raise plug.PlugError(
-                    "{} is not a file, please check the filepath you "
-                    "specified".format(raw_path)
-                )
 
 
-def _parse_from_classpath(pattern: str, classpath: str) -> pathlib.Path:
-    matches = re.search(pattern, classpath)
+@functools.lru_cache(maxsize=None)
+def _generate_classpath(
+    hamcrest_path: Optional[str], junit_path: Optional[str], classpath: str
+) -> str:
+    """Generate the classpath from the jar paths and the CLASSPATH variable.
+    This is needed twice for each student repo but is always the same, so it
+    is only generated (and any warnings emitted) once for each
+    configuration.
+    """
+    warn = (
+        "`{}` is not configured and not on the CLASSPATH variable."
+        "This will probably crash."
+    )
+    if not (
+        hamcrest_path or _junit4_runner.HAMCREST_JAR_REGEX.search(classpath)
+    ):
+        LOGGER.warning(warn.format("hamcrest"))
+    if not (junit_path or _junit4_runner.JUNIT4_JAR_REGEX.search(classpath)):
+        LOGGER.warning(warn.format("junit4"))
+
+    paths = []
+    if hamcrest_path:
+        paths.append(hamcrest_path)
+    if junit_path:
+        paths.append(junit_path)
+    return _java.generate_classpath(*paths, classpath=classpath)
+
+
+@functools.lru_cache(maxsize=None)
+def _check_jars_exist(
+    junit_path: Optional[str], hamcrest_path: Optional[str], classpath: str
+) -> None:
+    """Check that the jar files exist, falling back on the jars on the
+    classpath for any that are not specified. As this is the same for every
+    student repo, it is only checked once for each configuration.
+    """
+    junit_path = junit_path or _parse_from_classpath(
+        _junit4_runner.JUNIT4_JAR_REGEX, classpath
+    )
+    hamcrest_path = hamcrest_path or _parse_from_classpath(
+        _junit4_runner.HAMCREST_JAR_REGEX, classpath
+    )
+    for raw_path in (junit_path, hamcrest_path):
+        if not pathlib.Path(raw_path).is_file():
+            raise plug.PlugError(
+                "{} is not a file, please check the filepath you "
+                "specified".format(raw_path)
+            )
+
+
+@functools.lru_cache(maxsize=None)
+def _scan_reference_tests(
+    test_dir: pathlib.Path, ignore_tests: FrozenSet[str]
+) -> Tuple[pathlib.Path, ...]:
+    """Find all test classes in the reference test directory that are not
+    ignored. The reference tests are the same for every student repo of an
+    assignment, so the result is cached for the lifetime of the process:
+    changes to the reference test directory are not picked up until the next
+    invocation.
+    """
+    return tuple(
+        file
+        for file in test_dir.rglob("*.java")
+        if file.name.endswith("Test.java") and file.name not in ignore_tests
+    )
+
+
+def _parse_from_classpath(regex: Pattern[str], classpath: str) -> pathlib.Path:
+    matches = regex.search(classpath)
     if not matches:
         raise plug.PlugError(
-            f"expected to find match for '{pattern}' on the CLASSPATH variable"
+            f"expected to find match for '{regex.pattern}' on the CLASSPATH "
+            "variable"
         )
     return matches.group(0) if matches else None
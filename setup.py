@@ -22,7 +22,7 @@ test_requirements = [
     "pytest-mock",
     "pytest>=4.0.0",
 ]
-required = ["repobee>=3.4.1", "daiquiri", "colored>=2.0.0"]
+required = ["repobee>=3.4.1", "daiquiri", "colored>=2.0.0", "appdirs"]
 
 setup(
     name="repobee-junit4",
@@ -2,6 +2,8 @@ from repobee_junit4 import _junit4_runner
 from envvars import JUNIT_PATH, HAMCREST_PATH
 import re
 
+import pytest
+
 if not re.search(_junit4_runner.JUNIT4_JAR_PATTERN, str(JUNIT_PATH)):
     raise RuntimeError(
         "test suite requires the env variable "
@@ -13,3 +15,18 @@ if not re.search(_junit4_runner.HAMCREST_JAR_PATTERN, str(HAMCREST_PATH)):
         "test suite requires the env variable "
         "REPOBEE_JUNIT4_HAMCREST to contain the path to the hamcrest library"
     )
+
+
+@pytest.fixture(autouse=True)
+def isolate_caches(tmp_path, monkeypatch):
+    """Keep the compile and RTD clone caches out of the user's cache
+    directory, such that no test depends on entries left by earlier runs.
+    """
+    monkeypatch.setattr(
+        "repobee_junit4._compile_cache.CACHE_DIR",
+        tmp_path / "cache" / "compile",
+    )
+    monkeypatch.setattr(
+        "repobee_junit4._generate_rtd._CLONE_CACHE_DIR",
+        tmp_path / "cache" / "rtd-clones",
+    )
@@ -27,6 +27,8 @@ import pytest
 import repobee_plug as plug
 from repobee_junit4 import junit4
 from repobee_junit4 import _output
+from repobee_junit4 import _junit4_runner
+from repobee_junit4 import _compile_cache
 
 import envvars
 
@@ -70,6 +72,10 @@ PACKAGED_CODE_REPO = REPO_DIR / "student-packaged-code"
 DEFAULT_PACKAGED_CODE_REPO = REPO_DIR / "default-packaged-code"
 NO_DIR_STRUCTURE_REPO = REPO_DIR / "no-dir-structure-packaged-code"
 MULTIPLE_PACKAGES_REPO = REPO_DIR / "student-multiple-packages"
+COMPILE_ERROR_MULTIPLE_PACKAGES_REPO = (
+    REPO_DIR / "compile-error-multiple-packages"
+)
+FAILING_MULTIPLE_PACKAGES_REPO = REPO_DIR / "failing-multiple-packages"
 UNAUTHORIZED_READ_FILE_REPO = REPO_DIR / "unauthorized-read-file-week-10"
 UNAUTHORIZED_NETWORK_ACCESS_REPO = (
     REPO_DIR / "unauthorized-network-access-week-10"
@@ -120,6 +126,9 @@ def setup_hooks(
     disable_security=False,
     run_student_tests=False,
     timeout=10,
+    jobs=junit4.DEFAULT_JOBS,
+    fail_fast=False,
+    disable_compile_cache=False,
 ):
     """Return an instance of JUnit4Hooks with pre-configured arguments."""
     hooks = junit4.JUnit4Hooks("junit4")
@@ -133,6 +142,9 @@ def setup_hooks(
     hooks.junit4_disable_security = disable_security
     hooks.junit4_run_student_tests = run_student_tests
     hooks.junit4_timeout = timeout
+    hooks.junit4_jobs = jobs
+    hooks.junit4_fail_fast = fail_fast
+    hooks.junit4_disable_compile_cache = disable_compile_cache
     return hooks
 
 
@@ -472,6 +484,139 @@ BadClass.java:2: error: <identifier> expected
 
         assert result.status == plug.Status.SUCCESS
 
+    def test_concurrent_test_runs_keep_order_and_content(self):
+        """Test that running test classes concurrently yields the same
+        results, in the same order, as running them one at a time.
+        """
+        repo = wrap_in_student_repo(MULTIPLE_PACKAGES_REPO)
+
+        sequential_result = setup_hooks(jobs=1).post_clone(repo, api=None)
+        concurrent_result = setup_hooks(jobs=3).post_clone(repo, api=None)
+
+        assert concurrent_result.status == plug.Status.SUCCESS
+        assert concurrent_result.msg == sequential_result.msg
+        for fqn in (
+            "FiboTest",
+            "se.repobee.fibo.FiboTest",
+            "com.repobee.fibo.FiboTest",
+        ):
+            assert (
+                _output.test_result_header(
+                    fqn, NUM_FIBO_TESTS, NUM_FIBO_TESTS, _output.SUCCESS_COLOR
+                )
+                in concurrent_result.msg
+            )
+
+    def test_tests_run_despite_compile_error_without_fail_fast(
+        self, default_hooks
+    ):
+        result = default_hooks.post_clone(
+            wrap_in_student_repo(COMPILE_ERROR_MULTIPLE_PACKAGES_REPO),
+            api=None,
+        )
+
+        assert result.status == plug.Status.ERROR
+        assert "Compile error" in result.msg
+        assert "Test summary" in result.msg
+
+    def test_no_tests_run_on_compile_error_with_fail_fast(self):
+        hooks = setup_hooks(fail_fast=True)
+
+        with mock.patch(
+            "repobee_junit4._junit4_runner.run_test_class"
+        ) as run_test_class:
+            result = hooks.post_clone(
+                wrap_in_student_repo(COMPILE_ERROR_MULTIPLE_PACKAGES_REPO),
+                api=None,
+            )
+
+        assert result.status == plug.Status.ERROR
+        assert "Compile error" in result.msg
+        assert "Test summary" not in result.msg
+        assert not run_test_class.called
+
+    def test_stops_after_first_failing_test_class_with_fail_fast(self):
+        """Test that the test classes that have not started running when the
+        first test class fails are never run, and that only the first failure
+        is reported.
+        """
+        hooks = setup_hooks(fail_fast=True, jobs=1)
+        num_test_classes = 3
+        failure_summary = "Passed 0/{} tests".format(NUM_FIBO_TESTS)
+
+        with mock.patch(
+            "repobee_junit4._junit4_runner.run_test_class",
+            wraps=_junit4_runner.run_test_class,
+        ) as run_test_class:
+            result = hooks.post_clone(
+                wrap_in_student_repo(FAILING_MULTIPLE_PACKAGES_REPO), api=None
+            )
+
+        assert result.status == plug.Status.WARNING
+        assert result.msg.count(failure_summary) == 1
+        # with a single worker, at most the test class following the first
+        # failing one can have been started before the rest were cancelled
+        assert run_test_class.call_count < num_test_classes
+
+    def test_runs_all_failing_test_classes_without_fail_fast(self):
+        hooks = setup_hooks(jobs=1)
+        failure_summary = "Passed 0/{} tests".format(NUM_FIBO_TESTS)
+
+        result = hooks.post_clone(
+            wrap_in_student_repo(FAILING_MULTIPLE_PACKAGES_REPO), api=None
+        )
+
+        assert result.status == plug.Status.WARNING
+        assert result.msg.count(failure_summary) == 3
+
+    def test_runs_with_compile_cache_disabled(self):
+        """Test that classes are compiled next to their sources, and that
+        nothing is cached, when the compile cache is disabled.
+        """
+        hooks = setup_hooks(disable_compile_cache=True)
+
+        result = hooks.post_clone(
+            wrap_in_student_repo(MULTIPLE_PACKAGES_REPO), api=None
+        )
+
+        assert result.status == plug.Status.SUCCESS
+        assert (
+            _output.test_result_header(
+                "se.repobee.fibo.FiboTest",
+                NUM_FIBO_TESTS,
+                NUM_FIBO_TESTS,
+                _output.SUCCESS_COLOR,
+            )
+            in result.msg
+        )
+        assert list(MULTIPLE_PACKAGES_REPO.rglob("Fibo.class"))
+        assert not _compile_cache.CACHE_DIR.exists()
+
+    def test_compile_error_with_compile_cache_disabled(self):
+        """Test that the per test class fallback compilation finds the test
+        class that fails to compile when the compile cache is disabled, and
+        that the others are still run.
+        """
+        hooks = setup_hooks(disable_compile_cache=True)
+
+        result = hooks.post_clone(
+            wrap_in_student_repo(COMPILE_ERROR_MULTIPLE_PACKAGES_REPO),
+            api=None,
+        )
+
+        assert result.status == plug.Status.ERROR
+        assert "Compile error" in result.msg
+        assert (
+            _output.test_result_header(
+                "com.repobee.fibo.FiboTest",
+                NUM_FIBO_TESTS,
+                NUM_FIBO_TESTS,
+                _output.SUCCESS_COLOR,
+            )
+            in result.msg
+        )
+        assert not _compile_cache.CACHE_DIR.exists()
+
     def test_raises_when_rtd_does_not_exist(self):
         with tempfile.TemporaryDirectory() as deleted_dir:
             pass
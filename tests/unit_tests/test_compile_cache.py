@@ -0,0 +1,119 @@
+"""Tests for the compile cache. These do not require ``javac``."""
+
+import os
+
+import pytest
+
+from repobee_plug import Status
+
+from repobee_junit4 import _compile_cache
+
+
+@pytest.fixture
+def java_files(tmp_path):
+    files = [tmp_path / "Fibo.java", tmp_path / "FiboTest.java"]
+    for file in files:
+        file.write_text("public class {} {{}}".format(file.stem))
+    return files
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr("repobee_junit4._compile_cache.CACHE_DIR", cache_dir)
+    return cache_dir
+
+
+class TestCacheKey:
+    def test_key_is_stable(self, java_files):
+        classpath = os.pathsep.join([str(java_files[0].parent), "lib.jar"])
+
+        assert _compile_cache._cache_key(
+            java_files, classpath
+        ) == _compile_cache._cache_key(java_files, classpath)
+
+    def test_key_does_not_depend_on_file_order(self, java_files):
+        assert _compile_cache._cache_key(
+            java_files, ""
+        ) == _compile_cache._cache_key(reversed(java_files), "")
+
+    def test_key_changes_with_file_contents(self, java_files):
+        key = _compile_cache._cache_key(java_files, "")
+
+        java_files[0].write_text("public class Fibo { int x; }")
+
+        assert _compile_cache._cache_key(java_files, "") != key
+
+    def test_key_changes_with_classpath(self, java_files):
+        assert _compile_cache._cache_key(
+            java_files, "a.jar"
+        ) != _compile_cache._cache_key(java_files, "b.jar")
+
+    def test_key_changes_when_absolute_classpath_entry_is_modified(
+        self, java_files, tmp_path
+    ):
+        jar = tmp_path / "lib.jar"
+        jar.write_bytes(b"")
+        key = _compile_cache._cache_key(java_files, str(jar))
+
+        stat = jar.stat()
+        os.utime(jar, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        assert _compile_cache._cache_key(java_files, str(jar)) != key
+
+    def test_key_ignores_modification_of_relative_classpath_entry(
+        self, java_files, tmp_path, monkeypatch
+    ):
+        monkeypatch.chdir(tmp_path)
+        key = _compile_cache._cache_key(java_files, ".")
+
+        stat = tmp_path.stat()
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        assert _compile_cache._cache_key(java_files, ".") == key
+
+
+class TestCachedCompile:
+    def test_compiles_only_once(self, java_files, cache_dir):
+        compiled_to = []
+
+        def compile_to(output_dir):
+            compiled_to.append(output_dir)
+            (output_dir / "Fibo.class").write_bytes(b"")
+            return Status.SUCCESS, "ok"
+
+        first = _compile_cache.cached_compile(java_files, "", compile_to)
+        second = _compile_cache.cached_compile(java_files, "", compile_to)
+
+        assert len(compiled_to) == 1
+        assert first[0] == second[0] == Status.SUCCESS
+        assert first[2] == second[2]
+        assert (second[2] / "Fibo.class").is_file()
+
+    def test_recompiles_when_sources_change(self, java_files, cache_dir):
+        def compile_to(output_dir):
+            return Status.SUCCESS, "ok"
+
+        *_, first_dir = _compile_cache.cached_compile(
+            java_files, "", compile_to
+        )
+        java_files[0].write_text("public class Fibo { int x; }")
+        *_, second_dir = _compile_cache.cached_compile(
+            java_files, "", compile_to
+        )
+
+        assert first_dir != second_dir
+        assert first_dir.is_dir() and second_dir.is_dir()
+
+    def test_failed_compilation_is_not_cached(self, java_files, cache_dir):
+        def compile_to(output_dir):
+            return Status.ERROR, "Compile error"
+
+        status, msg, classes_dir = _compile_cache.cached_compile(
+            java_files, "", compile_to
+        )
+
+        assert status == Status.ERROR
+        assert msg == "Compile error"
+        assert classes_dir is None
+        assert not list(cache_dir.iterdir())
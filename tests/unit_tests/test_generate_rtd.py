@@ -0,0 +1,74 @@
+"""Tests for cloning template repos when generating the reference tests
+directory. These require ``git``, but not ``javac``.
+"""
+
+import shutil
+import subprocess
+
+import pytest
+
+from repobee_junit4 import _generate_rtd
+
+BRANCH = "solutions"
+
+
+@pytest.fixture
+def repo_url(tmp_path):
+    """A local repo with a single commit on the branch."""
+    repo = tmp_path / "template"
+    repo.mkdir()
+
+    def git(*args):
+        subprocess.run(
+            ["git", *args], cwd=repo, check=True, capture_output=True
+        )
+
+    git("init", "--initial-branch", BRANCH)
+    (repo / "FiboTest.java").write_text("public class FiboTest {}")
+    git("add", ".")
+    git(
+        "-c",
+        "user.name=Test",
+        "-c",
+        "user.email=test@example.com",
+        "commit",
+        "-m",
+        "Add test",
+    )
+    return repo.as_uri()
+
+
+class TestCloneRepoTo:
+    def test_clones_branch(self, repo_url, tmp_path):
+        clone = _generate_rtd._clone_repo_to(
+            repo_url, BRANCH, tmp_path / "clone"
+        )
+
+        assert (clone / "FiboTest.java").is_file()
+
+    def test_recreates_broken_cache_entry(self, repo_url, tmp_path):
+        _generate_rtd._clone_repo_to(repo_url, BRANCH, tmp_path / "first")
+        (cache,) = _generate_rtd._CLONE_CACHE_DIR.iterdir()
+        # emulate an interrupted git init
+        shutil.rmtree(cache)
+        cache.mkdir()
+
+        clone = _generate_rtd._clone_repo_to(
+            repo_url, BRANCH, tmp_path / "second"
+        )
+
+        assert (clone / "FiboTest.java").is_file()
+
+    def test_missing_branch_is_a_clone_error(self, repo_url, tmp_path):
+        with pytest.raises(_generate_rtd._CloneError):
+            _generate_rtd._clone_repo_to(
+                repo_url, "no-such-branch", tmp_path / "clone"
+            )
+
+    def test_missing_git_is_a_clone_error(
+        self, repo_url, tmp_path, monkeypatch
+    ):
+        monkeypatch.setenv("PATH", str(tmp_path / "empty"))
+
+        with pytest.raises(_generate_rtd._CloneError):
+            _generate_rtd._clone_repo_to(repo_url, BRANCH, tmp_path / "clone")
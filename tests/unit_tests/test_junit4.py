@@ -0,0 +1,29 @@
+"""Tests for the junit4 module that do not require ``javac``."""
+
+import argparse
+
+import pytest
+
+from repobee_junit4 import junit4
+
+
+class TestPositiveInt:
+    @pytest.mark.parametrize("value", ["1", "4", "128"])
+    def test_accepts_positive_values(self, value):
+        assert junit4._positive_int(value) == int(value)
+
+    @pytest.mark.parametrize("value", ["0", "-1"])
+    def test_rejects_values_below_one(self, value):
+        with pytest.raises(argparse.ArgumentTypeError) as exc_info:
+            junit4._positive_int(value)
+
+        assert "must be at least 1" in str(exc_info.value)
+
+    def test_invalid_jobs_is_a_usage_error(self, capsys):
+        parser = argparse.ArgumentParser()
+        parser.add_argument("--junit4-jobs", type=junit4._positive_int)
+
+        with pytest.raises(SystemExit):
+            parser.parse_args(["--junit4-jobs", "0"])
+
+        assert "must be at least 1" in capsys.readouterr().err
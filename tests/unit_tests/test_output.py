@@ -0,0 +1,288 @@
+"""Tests for parsing and formatting JUnit4 output. These do not require
+``javac``.
+"""
+
+import re
+import subprocess
+
+import pytest
+
+from repobee_junit4 import _output
+
+# the regex that failure descriptions used to be extracted with, which the
+# parser must agree with on single digit failure numbers
+_FAILED_TESTS_REGEX = re.compile(
+    r"^\d\) .*(?:\n(?!\s+at).*)*", flags=re.MULTILINE
+)
+
+TWO_FAILURES_OUTPUT = """JUnit version 4.13.2
+..E.E
+Time: 0.012
+There were 2 failures:
+1) isPrimeFalseForComposites(PrimeCheckerTest)
+java.lang.AssertionError:
+Expected: is <false>
+     but: was <true>
+\tat org.hamcrest.MatcherAssert.assertThat(MatcherAssert.java:20)
+\tat PrimeCheckerTest.isPrimeFalseForComposites(PrimeCheckerTest.java:30)
+2) oneIsNotPrime(PrimeCheckerTest)
+java.lang.AssertionError:
+Expected: is <false>
+     but: was <true>
+\tat org.hamcrest.MatcherAssert.assertThat(MatcherAssert.java:20)
+
+FAILURES!!!
+Tests run: 3,  Failures: 2
+"""
+
+
+class TestParseFailedTests:
+    def test_extracts_descriptions_without_stack_traces(self):
+        failures = _output._parse_failed_tests(TWO_FAILURES_OUTPUT)
+
+        assert failures == [
+            "1) isPrimeFalseForComposites(PrimeCheckerTest)\n"
+            "java.lang.AssertionError:\n"
+            "Expected: is <false>\n"
+            "     but: was <true>",
+            "2) oneIsNotPrime(PrimeCheckerTest)\n"
+            "java.lang.AssertionError:\n"
+            "Expected: is <false>\n"
+            "     but: was <true>",
+        ]
+
+    def test_no_failures(self):
+        output = "JUnit version 4.13.2\n..\nTime: 0.01\n\nOK (2 tests)\n"
+
+        assert _output._parse_failed_tests(output) == []
+
+    def test_blank_lines_before_stack_trace_count_as_indentation(self):
+        output = "1) test(SomeTest)\nmessage\n\nat SomeTest.test()\nlast"
+
+        assert _output._parse_failed_tests(output) == [
+            "1) test(SomeTest)\nmessage"
+        ]
+
+    def test_unindented_at_line_continues_description(self):
+        output = "1) test(SomeTest)\nat least one\n\tat SomeTest.test()"
+
+        assert _output._parse_failed_tests(output) == [
+            "1) test(SomeTest)\nat least one"
+        ]
+
+    def test_description_without_stack_trace_spans_rest_of_output(self):
+        output = "1) test(SomeTest)\nmessage\nmore message"
+
+        assert _output._parse_failed_tests(output) == [output]
+
+    def test_header_inside_description_does_not_start_new_failure(self):
+        output = "1) first(SomeTest)\n2) second(SomeTest)\n\tat trace"
+
+        assert _output._parse_failed_tests(output) == [
+            "1) first(SomeTest)\n2) second(SomeTest)"
+        ]
+
+    def test_multi_digit_failure_numbers(self):
+        """Failure numbers of more than one digit were not recognized by the
+        previous regex, which dropped every failure from the tenth on.
+        """
+        output = "".join(
+            "{}) test{}(SomeTest)\nmessage\n\tat trace\n".format(i, i)
+            for i in range(1, 12)
+        )
+
+        failures = _output._parse_failed_tests(output)
+
+        assert len(failures) == 11
+        assert failures[10] == "11) test11(SomeTest)\nmessage"
+
+    @pytest.mark.parametrize(
+        "line",
+        ["1)no space", ") test(SomeTest)", " 1) indented", "a1) test"],
+    )
+    def test_non_header_lines_are_ignored(self, line):
+        assert _output._parse_failed_tests(line + "\nmessage") == []
+
+    @pytest.mark.parametrize(
+        "output",
+        [
+            TWO_FAILURES_OUTPUT,
+            TWO_FAILURES_OUTPUT.replace("\t", "    "),
+            "1) a\n\n\n   \n\tat x\n2) b\n",
+            "1) a\nat b\n  atc\n3) d\n \n",
+            "x\n1) a\n\n",
+            "1) a\r\n\tat b\r\n2) c\r\n",
+            "",
+        ],
+    )
+    def test_agrees_with_previous_regex(self, output):
+        assert _output._parse_failed_tests(
+            output
+        ) == _FAILED_TESTS_REGEX.findall(output)
+
+
+def _previous_parse_summary(test_output: str):
+    """The summary parser that the substring search replaced."""
+    failed = re.search(r"Failures: (\d+)", test_output)
+    num_failed = int(failed.group(1)) if failed else 0
+    ok = re.search(r"OK \((\d+) tests\)", test_output)
+    if ok:
+        return int(ok.group(1)), num_failed
+    run = re.search(r"Tests run: (\d+)", test_output)
+    return (int(run.group(1)) if run else 0) - num_failed, num_failed
+
+
+class TestParseSummary:
+    def test_all_tests_passed(self):
+        output = b"JUnit version 4.13.2\n..\nTime: 0.01\n\nOK (2 tests)\n"
+
+        assert _output._parse_summary(output) == (2, 0)
+
+    def test_failures(self):
+        assert _output._parse_summary(TWO_FAILURES_OUTPUT.encode()) == (1, 2)
+
+    def test_no_summary(self):
+        assert _output._parse_summary(b"Exception in thread main") == (0, 0)
+
+    def test_skips_prefixes_not_followed_by_counts(self):
+        output = (
+            b"Tests run: many\nFailures: none\nOK (fine)\n"
+            b"Tests run: 5,  Failures: 3\n"
+        )
+
+        assert _output._parse_summary(output) == (2, 3)
+
+    @pytest.mark.parametrize(
+        "output",
+        [
+            TWO_FAILURES_OUTPUT,
+            "OK (12 tests)\nFailures: 1",
+            "OK (1 test)\nTests run: 4,  Failures: 1",
+            "Failures: x Failures: 7 Tests run: 10",
+            "OK ( 3 tests)",
+            "",
+        ],
+    )
+    def test_agrees_with_previous_parser(self, output):
+        assert _output._parse_summary(
+            output.encode()
+        ) == _previous_parse_summary(output)
+
+
+class TestBuild:
+    @pytest.fixture
+    def test_class(self, tmp_path):
+        test_class = tmp_path / "PrimeCheckerTest.java"
+        test_class.write_text("public class PrimeCheckerTest {}")
+        return test_class
+
+    def test_failed_run(self, test_class):
+        proc = subprocess.CompletedProcess(
+            args=[], returncode=1, stdout=TWO_FAILURES_OUTPUT.encode()
+        )
+
+        result = _output.TestResult.build(test_class, proc)
+
+        assert result.fqn == "PrimeCheckerTest"
+        assert not result.success
+        assert (result.num_passed, result.num_failed) == (1, 2)
+        assert len(result.test_failures) == 2
+
+    def test_successful_run_does_not_parse_failures(self, test_class):
+        proc = subprocess.CompletedProcess(
+            args=[], returncode=0, stdout=b"OK (3 tests)\n\xff"
+        )
+
+        result = _output.TestResult.build(test_class, proc)
+
+        assert result.success
+        assert (result.num_passed, result.num_failed) == (3, 0)
+        assert result.test_failures == []
+
+    def test_output_starting_mid_character_is_decoded(self, test_class):
+        """The output of a test run is a bounded tail, which may start in the
+        middle of a multi-byte character.
+        """
+        output = "ö\n1) test(PrimeCheckerTest)\nfel: ö\n\tat x\n".encode()
+        proc = subprocess.CompletedProcess(
+            args=[], returncode=1, stdout=output[1:]
+        )
+
+        result = _output.TestResult.build(test_class, proc)
+
+        assert result.test_failures == ["1) test(PrimeCheckerTest)\nfel: ö"]
+
+
+def _previous_truncate_lines(string, max_len, max_lines):
+    """The truncation that splitting off only the kept lines replaced, with
+    lines separated by newlines.
+    """
+    trunc_msg = _output._TRUNC_MSG
+    part_len = (max_len - len(trunc_msg)) // 2
+
+    def truncate(s):
+        if len(s) > max_len:
+            return s[:part_len] + trunc_msg + s[-part_len:]
+        return s
+
+    lines = [truncate(line) for line in string.split("\n")]
+    if len(lines) > max_lines:
+        lines = lines[: max_lines - 1] + [trunc_msg]
+    return "\n".join(lines)
+
+
+class TestTruncateLines:
+    def test_raises_if_max_len_does_not_fit_truncation_message(self):
+        with pytest.raises(ValueError):
+            _output._truncate_lines("line", max_len=len(_output._TRUNC_MSG))
+
+    def test_short_string_is_unchanged(self):
+        string = "first\nsecond"
+
+        assert _output._truncate_lines(string) == string
+
+    def test_long_line_keeps_head_and_tail(self):
+        line = "a" * 100 + "b" * 100
+
+        truncated = _output._truncate_lines(line, max_len=29)
+
+        assert truncated == "a" * 10 + _output._TRUNC_MSG + "b" * 10
+
+    def test_exactly_max_lines_are_kept(self):
+        string = "\n".join(map(str, range(5)))
+
+        assert _output._truncate_lines(string, max_lines=5) == string
+
+    def test_lines_past_max_lines_are_replaced(self):
+        string = "\n".join(map(str, range(6)))
+
+        truncated = _output._truncate_lines(string, max_lines=5)
+
+        assert truncated.split("\n") == [
+            "0",
+            "1",
+            "2",
+            "3",
+            _output._TRUNC_MSG,
+        ]
+
+    def test_carriage_returns_are_kept(self):
+        string = "first\r\nsecond\r\nthird"
+
+        assert _output._truncate_lines(string) == string
+
+    @pytest.mark.parametrize(
+        "string, max_len, max_lines",
+        [
+            ("x" * 500, 150, 10),
+            ("\n".join("y" * n for n in range(0, 400, 7)), 40, 10),
+            ("\n" * 20, 150, 10),
+            ("a\nb\nc", 150, 3),
+            ("a\nb\nc\n", 150, 3),
+            ("", 150, 1),
+        ],
+    )
+    def test_agrees_with_previous_truncation(self, string, max_len, max_lines):
+        assert _output._truncate_lines(
+            string, max_len=max_len, max_lines=max_lines
+        ) == _previous_truncate_lines(string, max_len, max_lines)